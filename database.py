@@ -74,6 +74,29 @@ def save_memory(user_id: str, text: str, memory_type: str = "general"):
     except Exception as e:
         return f"Error saving memory: {str(e)}"
 
+def match_user_memories(user_id: str, query: str, match_threshold: float = 0.5, match_count: int = 5):
+    """
+    Raw vector lookup for one user. Returns [{"content": ..., "similarity": ...}].
+    Raises on DB errors so callers can decide how to report them.
+    """
+    if not supabase: return []
+
+    query_vector = get_embedding(query)
+    response = supabase.rpc(
+        "match_memories",
+        {
+            "query_embedding": query_vector,
+            "match_threshold": match_threshold,
+            "match_count": match_count,
+            "filter_user_id": str(user_id) # <--- PASSING THE ID HERE
+        }
+    ).execute()
+
+    return [
+        {"content": item['content'], "similarity": item.get('similarity')}
+        for item in (response.data or [])
+    ]
+
 def search_memory(user_id: str, query: str, match_threshold: float = 0.5):
     """
     SECURE SEARCH: Finds memories ONLY for the specific user_id.
@@ -81,19 +104,9 @@ def search_memory(user_id: str, query: str, match_threshold: float = 0.5):
     if not supabase: return "Error: No DB"
     print(f"🔍 Searching memory for {user_id}: {query}")
     
-    query_vector = get_embedding(query)
     try:
-        response = supabase.rpc(
-            "match_memories",
-            {
-                "query_embedding": query_vector,
-                "match_threshold": match_threshold,
-                "match_count": 5,
-                "filter_user_id": str(user_id) # <--- PASSING THE ID HERE
-            }
-        ).execute()
-        
-        results = [item['content'] for item in response.data]
+        matches = match_user_memories(user_id, query, match_threshold)
+        results = [item['content'] for item in matches]
         return "\n".join(results) if results else "No relevant memories found."
     except Exception as e:
         return f"Error searching memory: {str(e)}"
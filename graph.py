@@ -18,13 +18,13 @@ from langchain_core.messages import SystemMessage # <--- NEW: For the persona
 try:
     from tools.memory import save_memory, search_memory
     from tools.calculator import calculator
-    from tools.calendar import list_calendar_events, add_calendar_event
+    from tools.calendar import list_calendar_events, add_calendar_event, add_calendar_events, check_availability, find_free_slots
     from tools.meeting import analyze_meeting
 except ImportError:
     # Fallback for flat structure
     from memory import save_memory, search_memory
     from calculator import calculator
-    from calendar import list_calendar_events, add_calendar_event
+    from calendar import list_calendar_events, add_calendar_event, add_calendar_events, check_availability, find_free_slots
     from meeting import analyze_meeting
 
 load_dotenv()
@@ -42,11 +42,12 @@ def init_llm(provider: str = "openai"):
 llm = init_llm("openai") 
 
 # --- CONNECT TOOLS ---
-tools_list = [save_memory, search_memory, calculator, list_calendar_events, add_calendar_event, analyze_meeting] # <--- Added here
+tools_list = [save_memory, search_memory, calculator, list_calendar_events, add_calendar_event, add_calendar_events, check_availability, find_free_slots, analyze_meeting] # <--- Added here
 llm_with_tools = llm.bind_tools(tools_list)
 
 class AgentState(TypedDict):
     messages: Annotated[list, add_messages]
+    memory_context: str # Prefetched memories for the current turn (overwritten every run)
 
 async def chatbot_node(state: AgentState):
     # --- DYNAMIC CONFIGURATION ---
@@ -73,9 +74,21 @@ async def chatbot_node(state: AgentState):
        - **DO NOT** mention the User ID in your final response.
        
     2. If the user provides enough info for a calendar event, just DO IT.
+       - For "am I free...?" use 'check_availability'; for "find a slot..." use 'find_free_slots'.
+       - Creating 2+ events at once? Use 'add_calendar_events'.
     3. Speak English/Singlish.
     4. If the user sends a LONG voice note, use 'analyze_meeting'.
     """
+
+    # --- PREFETCHED MEMORIES (see prefetch.py) ---
+    memory_context = state.get("memory_context")
+    if memory_context:
+        persona_text += f"""
+    RELEVANT MEMORIES (already retrieved for this message):
+{memory_context}
+    5. If these memories answer the question, use them directly and do NOT call 'search_memory'.
+       Only call 'search_memory' if you need something that is not listed here.
+    """
     
     persona = SystemMessage(content=persona_text)
     
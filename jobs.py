@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+
+# --- DURABLE BACKGROUND JOBS ---
+# Long voice notes (download -> Whisper -> analysis -> upload) run here instead of inside the
+# Telegram handler. Jobs live in a small SQLite file and record the last finished stage, so a
+# restart resumes where it stopped (a finished transcript is never re-transcribed).
+# Point JOB_DB_PATH / JOB_DIR at a Railway volume if jobs must survive redeploys too.
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.db")
+JOB_DIR = os.getenv("JOB_DIR", "job_files")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "30")) # Doubles each attempt
+JOB_RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "7"))           # Finished rows are pruned after this
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying cannot help (e.g. lapsed subscription): fail at once."""
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',   -- queued | running | done | failed
+    stage TEXT NOT NULL DEFAULT 'queued',    -- last checkpoint reached by the pipeline
+    payload TEXT NOT NULL DEFAULT '{}',      -- JSON: file_id, status_message_id, audio_path, transcript, result...
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,                         -- first time a worker picked it up
+    finished_at REAL,
+    next_attempt_at REAL                     -- retry backoff: not claimed before this time
+)
+"""
+
+
+class JobStore:
+    """
+    SQLite persistence for jobs. All calls happen on the event loop thread and are quick,
+    so one connection without extra locking is enough.
+    """
+
+    def __init__(self, path: str = JOB_DB_PATH):
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(SCHEMA)
+        # Older jobs.db files predate the retry backoff column
+        columns = [row["name"] for row in self.conn.execute("PRAGMA table_info(jobs)")]
+        if "next_attempt_at" not in columns:
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN next_attempt_at REAL")
+
+    def _to_job(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    def enqueue(self, kind: str, chat_id, payload: dict) -> int:
+        cur = self.conn.execute(
+            "INSERT INTO jobs (kind, chat_id, payload, created_at) VALUES (?, ?, ?, ?)",
+            (kind, str(chat_id), json.dumps(payload), time.time()),
+        )
+        return cur.lastrowid
+
+    def get(self, job_id: int):
+        return self._to_job(self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def claim_next(self):
+        """Oldest due queued job -> running. Safe without a transaction: no await in between."""
+        row = self.conn.execute(
+            "SELECT * FROM jobs WHERE status = 'queued' "
+            "AND (next_attempt_at IS NULL OR next_attempt_at <= ?) ORDER BY id LIMIT 1",
+            (time.time(),),
+        ).fetchone()
+        if row is None:
+            return None
+        self.conn.execute(
+            "UPDATE jobs SET status = 'running', attempts = attempts + 1, "
+            "started_at = COALESCE(started_at, ?) WHERE id = ?",
+            (time.time(), row["id"]),
+        )
+        return self.get(row["id"])
+
+    def checkpoint(self, job_id: int, stage: str, **payload_updates):
+        """Records a finished stage (and its outputs) so a restart skips it."""
+        job = self.get(job_id)
+        payload = {**job["payload"], **payload_updates}
+        self.conn.execute(
+            "UPDATE jobs SET stage = ?, payload = ? WHERE id = ?",
+            (stage, json.dumps(payload), job_id),
+        )
+
+    def finish(self, job_id: int):
+        self.conn.execute(
+            "UPDATE jobs SET status = 'done', error = NULL, finished_at = ? WHERE id = ?",
+            (time.time(), job_id),
+        )
+
+    def fail(self, job_id: int, error: str, retry: bool):
+        """Failed job -> back to the queue with exponential backoff, or 'failed' for good."""
+        job = self.get(job_id)
+        now = time.time()
+        if retry:
+            delay = JOB_RETRY_BASE_SECONDS * 2 ** max(job["attempts"] - 1, 0)
+            self.conn.execute(
+                "UPDATE jobs SET status = 'queued', error = ?, next_attempt_at = ? WHERE id = ?",
+                (error, now + delay, job_id),
+            )
+        else:
+            self.conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                (error, now, job_id),
+            )
+
+    def seconds_until_next_due(self):
+        """How long until the earliest backed-off job becomes claimable (None if none waiting)."""
+        row = self.conn.execute(
+            "SELECT MIN(next_attempt_at) AS due FROM jobs WHERE status = 'queued'"
+        ).fetchone()
+        if row["due"] is None:
+            return None
+        return max(0.0, row["due"] - time.time())
+
+    def prune(self, older_than_days: float = JOB_RETENTION_DAYS) -> int:
+        """Deletes finished/failed rows (and their transcripts) so jobs.db does not grow forever."""
+        cutoff = time.time() - older_than_days * 86400
+        cur = self.conn.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (cutoff,)
+        )
+        return cur.rowcount
+
+    def requeue_interrupted(self) -> int:
+        """Jobs left 'running' by a crash/restart go back to the queue, keeping their stage."""
+        cur = self.conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+        return cur.rowcount
+
+    def stats(self, window_seconds: int = 3600) -> dict:
+        since = time.time() - window_seconds
+        row = self.conn.execute(
+            """
+            SELECT
+                SUM(status = 'queued') AS queued,
+                SUM(status = 'running') AS running,
+                SUM(status = 'failed') AS failed,
+                SUM(status = 'done' AND finished_at >= ?) AS done_recent,
+                AVG(CASE WHEN started_at >= ? THEN started_at - created_at END) AS avg_wait,
+                AVG(CASE WHEN status = 'done' AND finished_at >= ? THEN finished_at - started_at END) AS avg_run
+            FROM jobs
+            """,
+            (since, since, since),
+        ).fetchone()
+        return {
+            "queued": row["queued"] or 0,
+            "running": row["running"] or 0,
+            "failed": row["failed"] or 0,
+            "done_per_hour": (row["done_recent"] or 0) * 3600 / window_seconds,
+            "avg_queue_wait_s": row["avg_wait"] or 0.0,
+            "avg_processing_s": row["avg_run"] or 0.0,
+        }
+
+
+class JobQueue:
+    """
+    Bounded worker pool on top of JobStore. 'handlers' maps job kind -> async fn(job, store).
+    Handlers resume from job['stage'] and call store.checkpoint() after each stage.
+    'on_failure' (optional async fn(job)) runs once a job has used up its attempts.
+    """
+
+    def __init__(self, store: JobStore, handlers: dict, workers: int = JOB_WORKERS, on_failure=None):
+        self.store = store
+        self.handlers = handlers
+        self.on_failure = on_failure
+        self.workers = workers
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+
+    def enqueue(self, kind: str, chat_id, payload: dict) -> int:
+        job_id = self.store.enqueue(kind, chat_id, payload)
+        print(f"📥 Job {job_id} ({kind}) queued for chat {chat_id}")
+        self._wakeup.set()
+        return job_id
+
+    def start(self):
+        os.makedirs(JOB_DIR, exist_ok=True)
+        pruned = self.store.prune()
+        if pruned:
+            print(f"🧹 Pruned {pruned} old job(s).")
+        resumed = self.store.requeue_interrupted()
+        if resumed:
+            print(f"♻️ Resuming {resumed} interrupted job(s)...")
+        for i in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(i)))
+        print(f"👷 Started {self.workers} background job worker(s).")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job = self.store.claim_next()
+            if job is None:
+                self._wakeup.clear()
+                # Sleep until woken by enqueue(), the next backed-off retry is due, or 30s (safety net)
+                due_in = self.store.seconds_until_next_due()
+                timeout = 30 if due_in is None else min(30, due_in + 0.1)
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            print(f"⚙️ Worker {worker_id} running job {job['id']} ({job['kind']}) from stage '{job['stage']}'")
+            try:
+                await self.handlers[job["kind"]](job, self.store)
+                self.store.finish(job["id"])
+            except asyncio.CancelledError:
+                # Shutdown mid-job: leave it 'running' so requeue_interrupted() picks it up
+                raise
+            except Exception as e:
+                retry = not isinstance(e, PermanentJobError) and job["attempts"] < JOB_MAX_ATTEMPTS
+                print(f"❌ Job {job['id']} failed (attempt {job['attempts']}/{JOB_MAX_ATTEMPTS}): {e}")
+                self.store.fail(job["id"], str(e), retry)
+                if not retry and self.on_failure:
+                    try:
+                        await self.on_failure(self.store.get(job["id"]))
+                    except Exception as notify_error:
+                        print(f"⚠️ Failure notification for job {job['id']} failed: {notify_error}")
+
+            s = self.store.stats()
+            print(
+                f"📊 Jobs: {s['queued']} queued, {s['running']} running, {s['failed']} failed | "
+                f"throughput {s['done_per_hour']:.1f}/h, avg queue wait {s['avg_queue_wait_s']:.1f}s, "
+                f"avg processing {s['avg_processing_s']:.1f}s"
+            )
@@ -1,7 +1,10 @@
 import os
 import json
 import logging
+import time
 import asyncio
+import tempfile
+from collections import defaultdict
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -10,11 +13,16 @@ from telegram.constants import ChatAction
 from telegram.ext import ApplicationBuilder, ContextTypes, MessageHandler, filters
 from google_auth_oauthlib.flow import InstalledAppFlow
 from openai import OpenAI
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import HumanMessage, AIMessage
 
 # Import our updated Database logic
 from database import check_user_subscription, save_user_google_token, get_user_google_token
 from graph import app
+from tools.meeting import analyze_meeting
+from jobs import JobStore, JobQueue
+from voice_jobs import VoiceJobSteps, process_voice_job, notify_job_failed
+from prefetch import start_prefetch, collect_prefetch, format_memory_context, used_search_memory, stats as prefetch_stats
+from tools.memory import clean_user_id
 
 load_dotenv()
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
@@ -30,6 +38,14 @@ client = OpenAI(api_key=OPENAI_API_KEY)
 # Global State for Auth Flow: { user_id: "WAITING" }
 AUTH_STATE = {}
 
+# Background worker pool for long voice notes (created in post_init, see jobs.py)
+JOB_QUEUE = None
+
+# One lock per LangGraph thread: background jobs write to the chat thread while handlers may be
+# mid-turn, and overlapping writes to MemorySaver can drop messages or orphan tool calls.
+THREAD_LOCKS = defaultdict(asyncio.Lock)
+INLINE_VOICE_SECONDS = int(os.getenv("INLINE_VOICE_SECONDS", "60")) # Longer notes go to the queue
+
 # --- 1. SETUP MASTER CREDENTIALS (YOUR APP ID) ---
 def setup_master_credentials():
     """
@@ -45,7 +61,11 @@ def setup_master_credentials():
         print("⚠️ Warning: GOOGLE_CREDENTIALS_JSON missing. Users cannot log in.")
 
 # --- 2. AUTH FLOW & GATEKEEPER ---
-async def check_access_and_auth(update, context):
+async def check_access_and_auth(update, context, on_subscribed=None):
+    """
+    'on_subscribed' (optional) is called once the subscription check passes, before the
+    token lookup. handle_message uses it to overlap the memory prefetch with that lookup.
+    """
     user_id = str(update.effective_user.id)
     
     # A. GATEKEEPER: Check Subscription
@@ -56,6 +76,9 @@ async def check_access_and_auth(update, context):
         )
         return False
 
+    if on_subscribed:
+        on_subscribed()
+
     # B. AUTH CHECK: Do we have their Token in Supabase?
     user_token = get_user_google_token(user_id)
     
@@ -141,12 +164,13 @@ async def send_smart_response(context, chat_id, text):
 
     if is_meeting or is_long:
         timestamp = datetime.now().strftime("%Y-%m-%d_%H%M")
-        filename = f"Meeting_Minutes_{timestamp}.md"
-        with open(filename, "w", encoding="utf-8") as f: f.write(text)
-        await context.bot.send_message(chat_id=chat_id, text="📝 Here is your structured report:")
-        with open(filename, "rb") as f:
-            await context.bot.send_document(chat_id=chat_id, document=f, caption="Minutes.md")
-        os.remove(filename)
+        # Private temp dir per report: background workers can finish two meetings in the same minute
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, f"Meeting_Minutes_{timestamp}.md")
+            with open(filename, "w", encoding="utf-8") as f: f.write(text)
+            await context.bot.send_message(chat_id=chat_id, text="📝 Here is your structured report:")
+            with open(filename, "rb") as f:
+                await context.bot.send_document(chat_id=chat_id, document=f, caption="Minutes.md")
     else:
         if len(text) > 4096:
             for x in range(0, len(text), 4096):
@@ -154,31 +178,50 @@ async def send_smart_response(context, chat_id, text):
         else:
             await context.bot.send_message(chat_id=chat_id, text=text)
 
-async def transcribe_voice(voice_file_path):
-    print("🎤 Transcribing...")
+def _transcribe_sync(voice_file_path):
     with open(voice_file_path, "rb") as f:
         return client.audio.transcriptions.create(model="whisper-1", file=f, language="en").text
 
-async def run_agent(chat_id, user_text, context):
+async def transcribe_voice(voice_file_path):
+    print("🎤 Transcribing...")
+    # The OpenAI client is blocking; run it in a thread so other chats stay responsive
+    return await asyncio.to_thread(_transcribe_sync, voice_file_path)
+
+async def run_agent(chat_id, user_text, context, prefetch=None):
     """
     Runs the LangGraph Agent using 'ainvoke' (Native Async).
+    'prefetch' is an optional memory lookup started earlier (see prefetch.py).
     """
     config = {"configurable": {"thread_id": str(chat_id)}}
     
     # ✅ THE FIX: Inject the ID here!
     secure_input = f"User ID: {chat_id}\n\n{user_text}" 
-    inputs = {"messages": [HumanMessage(content=secure_input)]}
     
     await context.bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING)
+    prefetched = await collect_prefetch(prefetch)
+    memories = prefetched["memories"] if prefetched else []
+
+    # Always set memory_context so last turn's memories don't leak into this one
+    inputs = {
+        "messages": [HumanMessage(content=secure_input)],
+        "memory_context": format_memory_context(memories),
+    }
     print(f"🤖 Agent started for chat {chat_id}...")
     
     try:
-        final_state = await app.ainvoke(inputs, config)
+        started = time.perf_counter()
+        async with THREAD_LOCKS[str(chat_id)]:
+            final_state = await app.ainvoke(inputs, config)
+        agent_ms = (time.perf_counter() - started) * 1000
         messages = final_state.get("messages", [])
         
         if not messages or isinstance(messages[-1], HumanMessage):
             return "Error: Agent failed."
 
+        if prefetched:
+            prefetch_stats.record(prefetched, used_search_memory(messages), agent_ms)
+            print(f"📊 Memory prefetch: {prefetch_stats.summary()}")
+
         final_response = messages[-1].content
         
 
@@ -191,13 +234,23 @@ async def run_agent(chat_id, user_text, context):
 
 # --- HANDLERS ---
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # 0. Speculative memory lookup, started only after the subscription check passes so
+    # non-subscribers never cost us an embedding call. It overlaps the token lookup/restore.
+    # Skipped while we wait for an OAuth code so the code is never sent for embedding.
+    # A subscriber without a token yet still pays for one wasted lookup (deliberate: rare, paid user).
+    prefetch = None
+    def start_memory_prefetch():
+        nonlocal prefetch
+        if AUTH_STATE.get(str(update.effective_user.id)) != "WAITING":
+            prefetch = start_prefetch(clean_user_id(update.effective_chat.id), update.message.text)
+
     # 1. Check Subscription & Auth
-    if not await check_access_and_auth(update, context):
+    if not await check_access_and_auth(update, context, on_subscribed=start_memory_prefetch):
         return 
 
     # 2. Run Logic
     try:
-        response_text = await run_agent(update.effective_chat.id, update.message.text, context)
+        response_text = await run_agent(update.effective_chat.id, update.message.text, context, prefetch)
         await send_smart_response(context, update.effective_chat.id, response_text)
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -213,10 +266,20 @@ async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await context.bot.send_message(chat_id=update.effective_chat.id, text="⚠️ File too large.")
         return
 
+    # Long notes (meetings): acknowledge now, process in the background job queue
+    if JOB_QUEUE and (file_obj.duration or 0) > INLINE_VOICE_SECONDS:
+        status_msg = await context.bot.send_message(chat_id=update.effective_chat.id, text="📥 Got it! Queued for processing...")
+        JOB_QUEUE.enqueue("voice", update.effective_chat.id, {
+            "user_id": str(update.effective_user.id),
+            "file_id": file_obj.file_id,
+            "status_message_id": status_msg.message_id,
+        })
+        return
+
+    file_path = f"temp_audio_{file_obj.file_unique_id}.ogg"
     try:
         status_msg = await context.bot.send_message(chat_id=update.effective_chat.id, text="⏳ Processing...")
         file_ref = await context.bot.get_file(file_obj.file_id)
-        file_path = "temp_audio.ogg"
         await file_ref.download_to_drive(file_path)
         
         transcript = await transcribe_voice(file_path)
@@ -228,6 +291,7 @@ async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await context.bot.delete_message(chat_id=update.effective_chat.id, message_id=status_msg.message_id)
             input_text = transcript
 
+        # No memory prefetch here: it needs the transcript, so it could not overlap anything
         response_text = await run_agent(update.effective_chat.id, input_text, context)
         await send_smart_response(context, update.effective_chat.id, response_text)
     except Exception as e:
@@ -235,12 +299,52 @@ async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     if os.path.exists(file_path): os.remove(file_path)
 
+# --- BACKGROUND VOICE JOBS ---
+async def remember_in_chat(chat_id, text):
+    """
+    Adds the minutes to the user's chat thread so follow-up questions can refer to them.
+    Best effort: the user already has the report, so a failure here must not fail the job.
+    """
+    config = {"configurable": {"thread_id": str(chat_id)}}
+    try:
+        async with THREAD_LOCKS[str(chat_id)]:
+            await app.aupdate_state(config, {"messages": [AIMessage(content=text)]}, as_node="agent")
+    except Exception as e:
+        print(f"⚠️ Could not store minutes in chat {chat_id}: {e}")
+
+async def start_background_jobs(application):
+    global JOB_QUEUE
+    # 'application' stands in for the handler context: send_smart_response only uses .bot
+    steps = VoiceJobSteps(
+        transcribe=transcribe_voice,
+        analyze=lambda transcript: analyze_meeting.ainvoke({"transcript": transcript}),
+        is_subscribed=lambda user_id: asyncio.to_thread(check_user_subscription, user_id),
+        deliver=lambda chat_id, text: send_smart_response(application, chat_id, text),
+        remember=remember_in_chat,
+    )
+    JOB_QUEUE = JobQueue(
+        JobStore(),
+        handlers={"voice": lambda job, store: process_voice_job(job, store, application.bot, steps)},
+        on_failure=lambda job: notify_job_failed(application.bot, job),
+    )
+    JOB_QUEUE.start()
+
+async def stop_background_jobs(application):
+    if JOB_QUEUE:
+        await JOB_QUEUE.stop()
+
 if __name__ == '__main__':
     # 1. Setup Admin Credentials
     setup_master_credentials()
     
     print("🚀 Gestella (SaaS Mode) is waking up...")
-    application = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+    application = (
+        ApplicationBuilder()
+        .token(TELEGRAM_TOKEN)
+        .post_init(start_background_jobs)
+        .post_shutdown(stop_background_jobs)
+        .build()
+    )
     application.add_handler(MessageHandler(filters.TEXT & (~filters.COMMAND), handle_message))
     application.add_handler(MessageHandler(filters.VOICE | filters.AUDIO, handle_voice))
     application.run_polling()
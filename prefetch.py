@@ -0,0 +1,135 @@
+import os
+import time
+import asyncio
+
+
+# --- SPECULATIVE MEMORY PREFETCH ---
+# Personal questions usually go: LLM turn -> search_memory -> embedding -> RPC -> LLM turn.
+# We start the embedding + RPC once the subscription check passes (overlapping the token lookup)
+# and hand the best matches to the first agent call, so the tool round trip is often skipped.
+
+PREFETCH_ENABLED = os.getenv("MEMORY_PREFETCH", "true").lower() == "true"
+PREFETCH_THRESHOLD = float(os.getenv("MEMORY_PREFETCH_THRESHOLD", "0.75")) # Stricter than the tool (0.5) so prompts don't bloat
+PREFETCH_COUNT = int(os.getenv("MEMORY_PREFETCH_COUNT", "3"))
+MAX_QUERY_CHARS = 2000   # Long transcripts are not questions; keep the embedding call cheap
+MAX_MEMORY_CHARS = 300   # Per memory, in the injected context
+
+
+class PrefetchStats:
+    """In-process counters so hit rate and saved latency show up in the logs."""
+
+    def __init__(self):
+        self.turns = 0              # Agent turns that had a prefetch
+        self.injected = 0           # ...where at least one memory passed the cutoff
+        self.hits = 0               # ...and the model did NOT call search_memory
+        self.tool_turns = 0         # Turns that still called search_memory
+        self.fallbacks = 0          # ...of which had memories injected (prefetch was not enough)
+        self.fetch_ms = 0.0         # Total embedding + RPC time spent in prefetch
+        self.wait_ms = 0.0          # Part of fetch_ms that was NOT hidden behind the token lookup
+        self.hit_turn_ms = 0.0      # Total agent time on hit turns
+        self.fallback_turn_ms = 0.0 # Total agent time on fallback turns
+
+    def record(self, result, used_search_tool: bool, agent_ms: float):
+        self.turns += 1
+        self.fetch_ms += result["fetch_ms"]
+        self.wait_ms += result["wait_ms"]
+
+        if used_search_tool:
+            self.tool_turns += 1
+        if result["memories"]:
+            self.injected += 1
+            if used_search_tool:
+                self.fallbacks += 1
+                self.fallback_turn_ms += agent_ms
+            else:
+                self.hits += 1
+                self.hit_turn_ms += agent_ms
+
+    def saved_ms_per_hit(self) -> float:
+        """
+        Estimated search_memory round trip (extra LLM turn + embedding + RPC) avoided per hit:
+        average fallback turn minus average hit turn. Both had memories injected, so the main
+        difference is the tool round trip. 0 until both have been seen.
+        """
+        if not self.hits or not self.fallbacks:
+            return 0.0
+        return max(0.0, self.fallback_turn_ms / self.fallbacks - self.hit_turn_ms / self.hits)
+
+    def summary(self) -> str:
+        hit_rate = (self.hits / self.turns * 100) if self.turns else 0.0
+        hidden = max(0.0, 1 - self.wait_ms / self.fetch_ms) * 100 if self.fetch_ms else 0.0
+        return (
+            f"hit rate {hit_rate:.0f}% ({self.hits}/{self.turns}), "
+            f"injected {self.injected}, fallbacks {self.fallbacks}, tool turns {self.tool_turns}, "
+            f"fetch hidden {hidden:.0f}%, est. saved ~{self.saved_ms_per_hit():.0f}ms/hit"
+        )
+
+
+stats = PrefetchStats()
+
+
+def _fetch(user_id: str, text: str):
+    # Imported here: database.py builds the Supabase/OpenAI clients at import time, and the
+    # stats/formatting helpers in this module should stay importable without them.
+    from database import match_user_memories
+
+    started = time.perf_counter()
+    try:
+        matches = match_user_memories(
+            user_id,
+            text[:MAX_QUERY_CHARS],
+            match_threshold=PREFETCH_THRESHOLD,
+            match_count=PREFETCH_COUNT,
+        )
+    except Exception as e:
+        print(f"⚠️ Memory prefetch failed: {e}")
+        matches = []
+
+    # The RPC already filters by threshold, but guard in case it returns similarity unfiltered
+    memories = [
+        m["content"][:MAX_MEMORY_CHARS]
+        for m in matches
+        if m.get("similarity") is None or m["similarity"] >= PREFETCH_THRESHOLD
+    ]
+    return {"memories": memories, "fetch_ms": (time.perf_counter() - started) * 1000}
+
+
+def start_prefetch(user_id: str, text: str):
+    """
+    Kicks off the lookup in a worker thread and returns its future (or None if disabled).
+    run_in_executor submits immediately, so the lookup really runs while the (blocking)
+    token lookup holds the event loop.
+    """
+    if not PREFETCH_ENABLED or not text or not text.strip():
+        return None
+    return asyncio.get_running_loop().run_in_executor(None, _fetch, user_id, text)
+
+
+async def collect_prefetch(future):
+    """Waits for a prefetch and reports how long we actually blocked on it."""
+    if future is None:
+        return None
+    started = time.perf_counter()
+    try:
+        result = await future
+    except Exception as e:
+        print(f"⚠️ Memory prefetch failed: {e}")
+        return None
+    result["wait_ms"] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def format_memory_context(memories) -> str:
+    if not memories:
+        return ""
+    return "\n".join(f"- {m}" for m in memories)
+
+
+def used_search_memory(messages) -> bool:
+    """True if the model called 'search_memory' after the latest user message."""
+    for msg in reversed(messages):
+        if msg.type == "human":
+            return False
+        if msg.type == "ai" and any(call["name"] == "search_memory" for call in (msg.tool_calls or [])):
+            return True
+    return False
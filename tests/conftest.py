@@ -0,0 +1,93 @@
+import os
+import sys
+
+import pytest
+
+# The repo has no package metadata; make 'tools' importable from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeRequest:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        return self.result
+
+
+class FakeEvents:
+    def __init__(self, service):
+        self.service = service
+
+    def list(self, **kwargs):
+        """Serves service.items in pages of service.page_size, like events.list."""
+        self.service.list_calls.append(kwargs)
+        offset = int(kwargs.get("pageToken") or 0)
+        page = self.service.items[offset:offset + self.service.page_size]
+        result = {"items": page}
+        if offset + self.service.page_size < len(self.service.items):
+            result["nextPageToken"] = str(offset + self.service.page_size)
+        return FakeRequest(result)
+
+    def insert(self, calendarId, body):
+        return FakeRequest({"id": f"evt-{body['summary']}", "htmlLink": "https://calendar/fake", **body})
+
+
+class FakeFreeBusy:
+    def __init__(self, service):
+        self.service = service
+
+    def query(self, body):
+        self.service.freebusy_calls.append(body)
+        return FakeRequest({"calendars": {item["id"]: {"busy": self.service.busy} for item in body["items"]}})
+
+
+class FakeBatch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.service.batch_sizes.append(len(self.requests))
+        if len(self.service.batch_sizes) in self.service.fail_batches:
+            raise ConnectionError("batch request failed")
+        for request_id, request in self.requests:
+            if request.result["summary"] in self.service.fail_summaries:
+                self.callback(request_id, None, RuntimeError(f"rejected {request.result['summary']}"))
+            else:
+                self.callback(request_id, request.execute(), None)
+
+
+class FakeCalendarService:
+    """
+    Stands in for googleapiclient's Calendar v3 service: events().list/insert,
+    freebusy().query and new_batch_http_request, with call recording and failure injection.
+    """
+
+    def __init__(self, items=(), busy=(), page_size=250, fail_summaries=(), fail_batches=()):
+        self.items = list(items)
+        self.busy = list(busy)
+        self.page_size = page_size
+        self.fail_summaries = set(fail_summaries)
+        self.fail_batches = set(fail_batches)  # 1-based batch numbers whose execute() raises
+        self.list_calls = []
+        self.freebusy_calls = []
+        self.batch_sizes = []
+
+    def events(self):
+        return FakeEvents(self)
+
+    def freebusy(self):
+        return FakeFreeBusy(self)
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+
+@pytest.fixture
+def fake_calendar():
+    return FakeCalendarService
@@ -0,0 +1,198 @@
+import datetime
+
+from tools.availability import (
+    IntervalIndex, parse_time, load_busy, load_events, build_event_body, insert_events_batch,
+    availability_report, free_slots_report, create_event, create_events,
+)
+
+HOUR = datetime.timedelta(hours=1)
+
+
+def t(value):
+    return parse_time(value)
+
+
+def timed_event(summary, start, end, **extra):
+    return {"summary": summary, "start": {"dateTime": start}, "end": {"dateTime": end}, **extra}
+
+
+# --- IntervalIndex ---
+
+def test_merges_overlapping_and_back_to_back_blocks():
+    index = IntervalIndex([
+        (t("2026-10-19T09:00"), t("2026-10-19T10:00"), "A"),
+        (t("2026-10-19T09:30"), t("2026-10-19T11:00"), "B"),  # overlaps A
+        (t("2026-10-19T11:00"), t("2026-10-19T12:00"), "C"),  # back-to-back with B
+        (t("2026-10-19T14:00"), t("2026-10-19T15:00"), "D"),
+    ])
+    assert index.merged == [
+        [t("2026-10-19T09:00"), t("2026-10-19T12:00")],
+        [t("2026-10-19T14:00"), t("2026-10-19T15:00")],
+    ]
+
+
+def test_conflicts_ignore_back_to_back_events():
+    index = IntervalIndex([
+        (t("2026-10-19T09:00"), t("2026-10-19T10:00"), "Standup"),
+        (t("2026-10-19T12:00"), t("2026-10-19T13:00"), "Lunch"),
+    ])
+    assert index.conflicts(t("2026-10-19T10:00"), t("2026-10-19T12:00")) == []
+    assert [c[2] for c in index.conflicts(t("2026-10-19T09:30"), t("2026-10-19T12:30"))] == ["Standup", "Lunch"]
+
+
+def test_free_slots_skip_busy_blocks_inside_working_hours():
+    index = IntervalIndex([
+        (t("2026-10-19T08:00"), t("2026-10-19T09:30"), "Early"),
+        (t("2026-10-19T12:00"), t("2026-10-19T13:00"), "Lunch"),
+        (t("2026-10-19T13:00"), t("2026-10-19T17:30"), "Workshop"),
+    ])
+    slots = index.free_slots(t("2026-10-19T00:00"), t("2026-10-20T00:00"), HOUR)
+    # 17:30-18:00 is too short for an hour
+    assert slots == [(t("2026-10-19T09:30"), t("2026-10-19T12:00"))]
+
+
+def test_free_slots_respect_multi_day_blocks_and_weekends():
+    index = IntervalIndex([
+        (t("2026-10-22T16:00"), t("2026-10-26T10:00"), "Offsite"),  # Thu afternoon -> Mon morning
+    ])
+    slots = index.free_slots(t("2026-10-22T00:00"), t("2026-10-27T00:00"), HOUR, limit=10)
+    assert slots == [
+        (t("2026-10-22T09:00"), t("2026-10-22T16:00")),
+        (t("2026-10-26T10:00"), t("2026-10-26T18:00")),
+    ]
+    weekend = index.free_slots(t("2026-10-24T00:00"), t("2026-10-25T00:00"), HOUR, include_weekends=True)
+    assert weekend == []
+
+
+def test_free_slots_stop_at_limit():
+    index = IntervalIndex([])
+    slots = index.free_slots(t("2026-10-19T00:00"), t("2026-10-31T00:00"), HOUR, limit=3)
+    assert [s[0].day for s in slots] == [19, 20, 21]
+
+
+# --- Loading from the (fake) Calendar service ---
+
+def test_load_events_follows_pagination(fake_calendar):
+    service = fake_calendar(items=[
+        timed_event(f"E{i}", f"2026-10-19T{9 + i:02d}:00:00+08:00", f"2026-10-19T{9 + i:02d}:30:00+08:00")
+        for i in range(5)
+    ], page_size=2)
+    index = load_events(service, t("2026-10-19T00:00"), t("2026-10-20T00:00"))
+    assert [i[2] for i in index.items] == ["E0", "E1", "E2", "E3", "E4"]
+    assert [call["pageToken"] for call in service.list_calls] == [None, "2", "4"]
+
+
+def test_load_events_skips_free_and_cancelled_and_expands_all_day(fake_calendar):
+    service = fake_calendar(items=[
+        {"summary": "Holiday", "start": {"date": "2026-10-20"}, "end": {"date": "2026-10-21"}, "transparency": "transparent"},
+        {"summary": "Conference", "start": {"date": "2026-10-21"}, "end": {"date": "2026-10-23"}},
+        timed_event("Cancelled", "2026-10-19T10:00:00Z", "2026-10-19T11:00:00Z", status="cancelled"),
+    ])
+    index = load_events(service, t("2026-10-19T00:00"), t("2026-10-24T00:00"))
+    assert index.items == [(t("2026-10-21T00:00"), t("2026-10-23T00:00"), "Conference")]
+
+
+def test_load_busy_uses_one_freebusy_query(fake_calendar):
+    service = fake_calendar(busy=[
+        {"start": "2026-10-19T01:00:00Z", "end": "2026-10-19T02:00:00Z"},  # 09:00-10:00 local
+    ])
+    index = load_busy(service, t("2026-10-19T00:00"), t("2026-10-20T00:00"))
+    assert len(service.freebusy_calls) == 1
+    assert index.merged == [[t("2026-10-19T09:00"), t("2026-10-19T10:00")]]
+
+
+# --- Batch creation ---
+
+def test_insert_events_batch_chunks_and_maps_results(fake_calendar):
+    service = fake_calendar()
+    start = t("2026-10-19T09:00")
+    bodies = [build_event_body(f"E{i}", start, start + HOUR) for i in range(120)]
+    results = insert_events_batch(service, bodies)
+    assert service.batch_sizes == [50, 50, 20]
+    assert [r["summary"] for r in results] == [f"E{i}" for i in range(120)]
+
+
+def test_insert_events_batch_reports_partial_failure(fake_calendar):
+    service = fake_calendar(fail_summaries={"B"})
+    start = t("2026-10-19T09:00")
+    results = insert_events_batch(service, [build_event_body(s, start, start + HOUR) for s in "ABC"])
+    assert results[0]["summary"] == "A"
+    assert isinstance(results[1], RuntimeError)
+    assert results[2]["summary"] == "C"
+
+
+def test_insert_events_batch_keeps_earlier_chunks_when_a_later_chunk_fails(fake_calendar):
+    service = fake_calendar(fail_batches={2})
+    start = t("2026-10-19T09:00")
+    results = insert_events_batch(service, [build_event_body(f"E{i}", start, start + HOUR) for i in range(60)])
+    assert all(isinstance(r, dict) for r in results[:50])
+    assert all(isinstance(r, ConnectionError) for r in results[50:])
+
+
+# --- Tool reports ---
+
+def lunch_service(fake_calendar, **kwargs):
+    return fake_calendar(
+        items=[timed_event("Lunch", "2026-10-19T12:00:00+08:00", "2026-10-19T13:00:00+08:00")],
+        busy=[{"start": "2026-10-19T04:00:00Z", "end": "2026-10-19T05:00:00Z"}],
+        **kwargs,
+    )
+
+
+def test_availability_report(fake_calendar):
+    service = lunch_service(fake_calendar)
+    assert availability_report(service, "2026-10-19T11:00:00", "2026-10-19T14:00:00") == (
+        "📅 Busy during Mon 19 Oct, 11:00 AM - 02:00 PM:\n"
+        "- Mon 19 Oct, 12:00 PM - 01:00 PM: Lunch"
+    )
+    assert availability_report(fake_calendar(), "2026-10-19T14:00:00", "2026-10-19T15:00:00") == (
+        "✅ Free for all of Mon 19 Oct, 02:00 PM - 03:00 PM."
+    )
+
+
+def test_free_slots_report(fake_calendar):
+    service = lunch_service(fake_calendar)
+    report = free_slots_report(service, "2026-10-19T00:00:00", "2026-10-20T00:00:00", 60)
+    assert report == (
+        "🟢 **Free slots (60 min+):**\n"
+        "- Mon 19 Oct, 09:00 AM - 12:00 PM\n"
+        "- Mon 19 Oct, 01:00 PM - 06:00 PM"
+    )
+    assert len(service.freebusy_calls) == 1
+
+
+def test_create_event_refuses_overlap_unless_allowed(fake_calendar):
+    service = lunch_service(fake_calendar)
+    refused = create_event(service, "Call", "2026-10-19T12:30:00", "2026-10-19T13:30:00")
+    assert refused.startswith("⚠️ Not created. 'Call' overlaps with:\n- Mon 19 Oct, 12:00 PM - 01:00 PM: Lunch")
+    created = create_event(service, "Call", "2026-10-19T12:30:00", "2026-10-19T13:30:00", allow_conflicts=True)
+    assert created == "✅ Event created: https://calendar/fake"
+
+
+def test_create_events_checks_new_events_against_each_other(fake_calendar):
+    service = lunch_service(fake_calendar)
+    events = [
+        {"summary": "A", "start_time": "2026-10-19T09:00:00", "end_time": "2026-10-19T10:00:00"},
+        {"summary": "B", "start_time": "2026-10-19T09:30:00", "end_time": "2026-10-19T10:30:00"},
+    ]
+    assert "- 'B' overlaps A (Mon 19 Oct, 09:00 AM - 10:00 AM)" in create_events(service, events)
+    assert service.batch_sizes == []
+
+    assert create_events(service, events, allow_conflicts=True) == (
+        "✅ A (Mon 19 Oct, 09:00 AM - 10:00 AM)\n"
+        "✅ B (Mon 19 Oct, 09:30 AM - 10:30 AM)"
+    )
+    assert service.batch_sizes == [2]
+
+
+def test_create_events_reports_each_item_on_partial_failure(fake_calendar):
+    service = fake_calendar(fail_summaries={"B"})
+    events = [
+        {"summary": s, "start_time": f"2026-10-19T{h}:00:00", "end_time": f"2026-10-19T{h}:30:00"}
+        for s, h in (("A", "09"), ("B", "10"), ("C", "11"))
+    ]
+    assert create_events(service, events).splitlines() == [
+        "✅ A (Mon 19 Oct, 09:00 AM - 09:30 AM)",
+        "❌ B: rejected B",
+        "✅ C (Mon 19 Oct, 11:00 AM - 11:30 AM)",
+    ]
@@ -0,0 +1,240 @@
+import asyncio
+import json
+import sqlite3
+import time
+
+import pytest
+
+import jobs
+import voice_jobs
+from jobs import JobStore, JobQueue, PermanentJobError
+from voice_jobs import VoiceJobSteps, process_voice_job, notify_job_failed
+
+
+# --- JobStore ---
+
+def test_requeue_interrupted_keeps_stage(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    job_id = store.enqueue("voice", 1, {"file_id": "f"})
+    store.claim_next()
+    store.checkpoint(job_id, "transcribed", transcript="hello")
+
+    # Simulate a restart: a fresh store on the same file
+    store = JobStore(str(tmp_path / "jobs.db"))
+    assert store.requeue_interrupted() == 1
+    job = store.claim_next()
+    assert (job["id"], job["stage"], job["payload"]["transcript"]) == (job_id, "transcribed", "hello")
+
+
+def test_claim_next_respects_backoff(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_RETRY_BASE_SECONDS", 60)
+    store = JobStore(str(tmp_path / "jobs.db"))
+    job_id = store.enqueue("voice", 1, {})
+    store.claim_next()
+    store.fail(job_id, "rate limited", retry=True)
+
+    assert store.claim_next() is None
+    assert 59 < store.seconds_until_next_due() <= 60
+
+    store.conn.execute("UPDATE jobs SET next_attempt_at = ? WHERE id = ?", (time.time() - 1, job_id))
+    assert store.claim_next()["id"] == job_id
+
+
+def test_backoff_doubles_per_attempt(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_RETRY_BASE_SECONDS", 10)
+    store = JobStore(str(tmp_path / "jobs.db"))
+    job_id = store.enqueue("voice", 1, {})
+    store.conn.execute("UPDATE jobs SET attempts = 3 WHERE id = ?", (job_id,))
+    store.fail(job_id, "boom", retry=True)
+    assert 39 < store.seconds_until_next_due() <= 40
+
+
+def test_migrates_old_schema(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, "
+        "chat_id TEXT NOT NULL, status TEXT NOT NULL DEFAULT 'queued', stage TEXT NOT NULL DEFAULT 'queued', "
+        "payload TEXT NOT NULL DEFAULT '{}', attempts INTEGER NOT NULL DEFAULT 0, error TEXT, "
+        "created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+    )
+    conn.execute("INSERT INTO jobs (kind, chat_id, payload, created_at) VALUES ('voice', '1', ?, ?)",
+                 (json.dumps({"file_id": "old"}), time.time()))
+    conn.commit()
+    conn.close()
+
+    store = JobStore(path)
+    columns = [row["name"] for row in store.conn.execute("PRAGMA table_info(jobs)")]
+    assert "next_attempt_at" in columns
+    assert store.claim_next()["payload"] == {"file_id": "old"}
+
+
+def test_prune_removes_only_old_finished_rows(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    old, recent, queued = (store.enqueue("voice", 1, {}) for _ in range(3))
+    store.conn.execute("UPDATE jobs SET status = 'done', finished_at = ? WHERE id = ?", (time.time() - 30 * 86400, old))
+    store.conn.execute("UPDATE jobs SET status = 'done', finished_at = ? WHERE id = ?", (time.time(), recent))
+    assert store.prune(older_than_days=7) == 1
+    assert store.get(old) is None and store.get(recent) and store.get(queued)
+
+
+# --- JobQueue ---
+
+def run_until_failed(store, handler):
+    """Runs a 1-worker queue on one job until on_failure fires. Returns (failed job, attempts seen)."""
+    seen = []
+
+    async def main():
+        failed = asyncio.get_running_loop().create_future()
+
+        async def counting_handler(job, store):
+            seen.append(job["attempts"])
+            await handler(job, store)
+
+        async def on_failure(job):
+            failed.set_result(job)
+
+        queue = JobQueue(store, {"voice": counting_handler}, workers=1, on_failure=on_failure)
+        queue.start()
+        queue.enqueue("voice", 1, {})
+        try:
+            return await asyncio.wait_for(failed, timeout=5)
+        finally:
+            await queue.stop()
+
+    return asyncio.run(main()), seen
+
+
+def test_fails_for_good_after_max_attempts(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_DIR", str(tmp_path / "files"))
+    monkeypatch.setattr(jobs, "JOB_RETRY_BASE_SECONDS", 0.01)
+    monkeypatch.setattr(jobs, "JOB_MAX_ATTEMPTS", 3)
+
+    async def flaky(job, store):
+        raise RuntimeError("rate limited")
+
+    job, seen = run_until_failed(JobStore(str(tmp_path / "jobs.db")), flaky)
+    assert seen == [1, 2, 3]
+    assert (job["status"], job["error"]) == ("failed", "rate limited")
+
+
+def test_permanent_error_is_not_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_DIR", str(tmp_path / "files"))
+
+    async def lapsed(job, store):
+        raise PermanentJobError("Subscription is no longer active.")
+
+    job, seen = run_until_failed(JobStore(str(tmp_path / "jobs.db")), lapsed)
+    assert seen == [1]
+    assert job["status"] == "failed"
+
+
+# --- Voice pipeline ---
+
+class FakeFile:
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def download_to_drive(self, path):
+        self.bot.downloads.append(path)
+        with open(path, "wb") as f:
+            f.write(b"ogg")
+
+
+class FakeBot:
+    def __init__(self):
+        self.downloads = []
+        self.edits = []
+        self.deleted = []
+
+    async def get_file(self, file_id):
+        return FakeFile(self)
+
+    async def edit_message_text(self, chat_id, message_id, text):
+        if message_id in self.deleted:
+            raise RuntimeError("message to edit not found")
+        self.edits.append(text)
+
+    async def delete_message(self, chat_id, message_id):
+        self.deleted.append(message_id)
+
+
+def make_steps(calls, subscribed=True, deliver_error=None):
+    async def transcribe(path):
+        calls.append(("transcribe", path))
+        return "long meeting transcript"
+
+    async def analyze(transcript):
+        calls.append(("analyze", transcript))
+        return "# Minutes"
+
+    async def is_subscribed(user_id):
+        calls.append(("is_subscribed", user_id))
+        return subscribed
+
+    async def deliver(chat_id, text):
+        if deliver_error:
+            raise deliver_error
+        calls.append(("deliver", chat_id, text))
+
+    async def remember(chat_id, text):
+        calls.append(("remember", chat_id))
+
+    return VoiceJobSteps(transcribe, analyze, is_subscribed, deliver, remember)
+
+
+def new_job(store, payload, stage=None, **checkpoint):
+    job_id = store.enqueue("voice", "-100", {"file_id": "f", "status_message_id": 7, "user_id": "42", **payload})
+    if stage:
+        store.checkpoint(job_id, stage, **checkpoint)
+    return store.claim_next()
+
+
+def test_resume_from_transcribed_skips_transcription(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    job = new_job(store, {}, "transcribed", transcript="saved transcript")
+    bot, calls = FakeBot(), []
+
+    asyncio.run(process_voice_job(job, store, bot, make_steps(calls)))
+
+    assert [c[0] for c in calls] == ["is_subscribed", "analyze", "deliver", "remember"]
+    assert ("analyze", "saved transcript") in calls
+    assert bot.downloads == []
+    finished = store.get(job["id"])
+    assert finished["stage"] == "delivered"
+    assert finished["payload"]["transcript"] is None and finished["payload"]["result"] is None
+
+
+def test_subscription_is_checked_for_the_sender_not_the_chat(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    job = new_job(store, {}, "transcribed", transcript="t")
+    calls = []
+    with pytest.raises(PermanentJobError):
+        asyncio.run(process_voice_job(job, store, FakeBot(), make_steps(calls, subscribed=False)))
+    assert calls == [("is_subscribed", "42")]
+
+
+def test_missing_audio_is_downloaded_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(voice_jobs, "JOB_DIR", str(tmp_path))
+    store = JobStore(str(tmp_path / "jobs.db"))
+    job = new_job(store, {}, "downloaded", audio_path=str(tmp_path / "gone.ogg"))
+    bot, calls = FakeBot(), []
+
+    asyncio.run(process_voice_job(job, store, bot, make_steps(calls)))
+
+    assert bot.downloads == [str(tmp_path / f"job_{job['id']}.ogg")]
+    assert calls[0][0] == "transcribe"
+    assert not (tmp_path / f"job_{job['id']}.ogg").exists()
+
+
+def test_status_message_survives_failed_delivery(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    job = new_job(store, {}, "analyzed", result="# Minutes")
+    bot = FakeBot()
+    with pytest.raises(RuntimeError, match="telegram down"):
+        asyncio.run(process_voice_job(job, store, bot, make_steps([], deliver_error=RuntimeError("telegram down"))))
+    assert bot.deleted == []
+
+    store.fail(job["id"], "telegram down", retry=False)
+    asyncio.run(notify_job_failed(bot, store.get(job["id"])))
+    assert bot.edits[-1].startswith("❌ Sorry")
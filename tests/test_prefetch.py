@@ -0,0 +1,66 @@
+from types import SimpleNamespace
+
+from prefetch import PrefetchStats, format_memory_context, used_search_memory
+
+
+def prefetched(memories, fetch_ms=100.0, wait_ms=20.0):
+    return {"memories": memories, "fetch_ms": fetch_ms, "wait_ms": wait_ms}
+
+
+def human(text="hi"):
+    return SimpleNamespace(type="human", content=text)
+
+
+def ai(*tool_names):
+    return SimpleNamespace(type="ai", tool_calls=[{"name": name} for name in tool_names])
+
+
+def tool():
+    return SimpleNamespace(type="tool")
+
+
+# --- PrefetchStats ---
+
+def test_hit_fallback_and_empty_turns_are_counted_separately():
+    stats = PrefetchStats()
+    stats.record(prefetched(["likes kopi"]), used_search_tool=False, agent_ms=1000)  # hit
+    stats.record(prefetched(["likes kopi"]), used_search_tool=True, agent_ms=3000)   # fallback
+    stats.record(prefetched([]), used_search_tool=True, agent_ms=9000)               # nothing injected
+    assert (stats.turns, stats.injected, stats.hits, stats.fallbacks, stats.tool_turns) == (3, 2, 1, 1, 2)
+
+
+def test_saved_latency_only_compares_turns_that_had_injected_memories():
+    stats = PrefetchStats()
+    stats.record(prefetched(["a"]), used_search_tool=False, agent_ms=1000)
+    stats.record(prefetched(["a"]), used_search_tool=True, agent_ms=2500)
+    # A slow tool turn without any prefetched memories must not inflate the estimate
+    stats.record(prefetched([]), used_search_tool=True, agent_ms=60000)
+    assert stats.saved_ms_per_hit() == 1500
+
+
+def test_saved_latency_is_zero_until_hits_and_fallbacks_exist():
+    stats = PrefetchStats()
+    stats.record(prefetched(["a"]), used_search_tool=False, agent_ms=1000)
+    assert stats.saved_ms_per_hit() == 0.0
+
+
+def test_summary_reports_hidden_fetch_share():
+    stats = PrefetchStats()
+    stats.record(prefetched(["a"], fetch_ms=200, wait_ms=50), used_search_tool=False, agent_ms=1000)
+    summary = stats.summary()
+    assert "hit rate 100% (1/1)" in summary
+    assert "fetch hidden 75%" in summary
+
+
+# --- Helpers ---
+
+def test_format_memory_context():
+    assert format_memory_context([]) == ""
+    assert format_memory_context(["likes kopi", "wife is Aisha"]) == "- likes kopi\n- wife is Aisha"
+
+
+def test_used_search_memory_only_looks_at_the_current_turn():
+    # search_memory was called in an earlier turn, not after the latest user message
+    history = [human(), ai("search_memory"), tool(), ai(), human(), ai("add_calendar_event"), tool(), ai()]
+    assert used_search_memory(history) is False
+    assert used_search_memory(history[:-1] + [ai("search_memory"), tool(), ai()]) is True
@@ -0,0 +1,249 @@
+import datetime
+from bisect import bisect_left
+from zoneinfo import ZoneInfo
+
+# --- LOCAL AVAILABILITY ENGINE ---
+# Pulls a window of busy time from Google ONCE (freeBusy or paginated events.list), builds a
+# sorted interval index, and answers free-slot / conflict questions locally.
+# Every function takes the Calendar 'service' as an argument, so a fake service works in tests.
+
+TIMEZONE = "Asia/Singapore"
+TZ = ZoneInfo(TIMEZONE)
+BATCH_LIMIT = 50  # Google's max requests per batch HTTP call
+
+
+def parse_time(value: str) -> datetime.datetime:
+    """ISO string -> aware datetime. Naive times are treated as local (TIMEZONE)."""
+    dt = datetime.datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=TZ)
+    return dt
+
+
+def _event_bounds(event: dict):
+    """Google event -> (start, end). All-day events ('date') span whole local days."""
+    start, end = event["start"], event["end"]
+    if "dateTime" in start:
+        return parse_time(start["dateTime"]), parse_time(end["dateTime"])
+    day_start = datetime.datetime.combine(datetime.date.fromisoformat(start["date"]), datetime.time(), TZ)
+    day_end = datetime.datetime.combine(datetime.date.fromisoformat(end["date"]), datetime.time(), TZ)
+    return day_start, day_end
+
+
+class IntervalIndex:
+    """
+    Busy intervals sorted by start. 'merged' holds the non-overlapping union used for free
+    slots; 'items' keeps the original labelled intervals so conflicts can name the event.
+    """
+
+    def __init__(self, intervals):
+        # intervals: iterable of (start, end, label)
+        self.items = sorted((i for i in intervals if i[1] > i[0]), key=lambda i: i[0])
+        self._starts = [i[0] for i in self.items]
+
+        self.merged = []
+        for start, end, _ in self.items:
+            if self.merged and start <= self.merged[-1][1]:
+                self.merged[-1][1] = max(self.merged[-1][1], end)
+            else:
+                self.merged.append([start, end])
+        self._merged_ends = [m[1] for m in self.merged]
+
+    def add(self, start, end, label=""):
+        """Returns a new index including one more interval (used when batch-adding events)."""
+        return IntervalIndex(self.items + [(start, end, label)])
+
+    def conflicts(self, start, end):
+        """Labelled intervals overlapping [start, end)."""
+        upto = bisect_left(self._starts, end)
+        return [i for i in self.items[:upto] if i[1] > start]
+
+    def free_slots(self, start, end, duration: datetime.timedelta,
+                   day_start=datetime.time(9), day_end=datetime.time(18),
+                   include_weekends: bool = False, limit: int = 5):
+        """Free gaps of at least 'duration' inside working hours, earliest first."""
+        slots = []
+        day = start.astimezone(TZ).date()
+        last_day = end.astimezone(TZ).date()
+        while day <= last_day and len(slots) < limit:
+            if include_weekends or day.weekday() < 5:
+                window_start = max(start, datetime.datetime.combine(day, day_start, TZ))
+                window_end = min(end, datetime.datetime.combine(day, day_end, TZ))
+                cursor = window_start
+                pos = bisect_left(self._merged_ends, window_start)
+                while cursor < window_end and len(slots) < limit:
+                    block = self.merged[pos] if pos < len(self.merged) else None
+                    gap_end = min(block[0], window_end) if block else window_end
+                    if gap_end - cursor >= duration:
+                        slots.append((cursor, gap_end))
+                    if not block or block[0] >= window_end:
+                        break
+                    cursor = max(cursor, block[1])
+                    pos += 1
+            day += datetime.timedelta(days=1)
+        return slots
+
+
+def load_busy(service, start, end, calendar_ids=("primary",)) -> IntervalIndex:
+    """One freeBusy call for the whole window. Fast, but carries no event titles."""
+    body = {
+        "timeMin": start.isoformat(),
+        "timeMax": end.isoformat(),
+        "timeZone": TIMEZONE,
+        "items": [{"id": cid} for cid in calendar_ids],
+    }
+    result = service.freebusy().query(body=body).execute()
+    intervals = []
+    for cal in result.get("calendars", {}).values():
+        for busy in cal.get("busy", []):
+            intervals.append((parse_time(busy["start"]), parse_time(busy["end"]), "Busy"))
+    return IntervalIndex(intervals)
+
+
+def load_events(service, start, end, calendar_id="primary") -> IntervalIndex:
+    """Paginated events.list for the window, keeping titles. Skips 'free' (transparent) events."""
+    intervals = []
+    page_token = None
+    while True:
+        result = service.events().list(
+            calendarId=calendar_id,
+            timeMin=start.isoformat(),
+            timeMax=end.isoformat(),
+            singleEvents=True,
+            orderBy="startTime",
+            maxResults=250,
+            pageToken=page_token,
+        ).execute()
+        for event in result.get("items", []):
+            if event.get("transparency") == "transparent" or event.get("status") == "cancelled":
+                continue
+            ev_start, ev_end = _event_bounds(event)
+            intervals.append((ev_start, ev_end, event.get("summary", "(No title)")))
+        page_token = result.get("nextPageToken")
+        if not page_token:
+            break
+    return IntervalIndex(intervals)
+
+
+def build_event_body(summary, start, end, description=""):
+    return {
+        "summary": summary,
+        "description": description,
+        "start": {"dateTime": start.isoformat(), "timeZone": TIMEZONE},
+        "end": {"dateTime": end.isoformat(), "timeZone": TIMEZONE},
+    }
+
+
+def insert_events_batch(service, bodies, calendar_id="primary"):
+    """
+    Creates many events via the batch HTTP endpoint (one round trip per 50 events).
+    Returns a list aligned with 'bodies': created event dict, or the Exception for that item.
+    A chunk whose batch call fails as a whole marks only its own items as failed, so events
+    from earlier chunks are still reported as created (and not re-created on a retry).
+    """
+    results = [None] * len(bodies)
+
+    def callback(request_id, response, exception):
+        results[int(request_id)] = exception if exception is not None else response
+
+    for offset in range(0, len(bodies), BATCH_LIMIT):
+        batch = service.new_batch_http_request(callback=callback)
+        for i, body in enumerate(bodies[offset:offset + BATCH_LIMIT], start=offset):
+            batch.add(service.events().insert(calendarId=calendar_id, body=body), request_id=str(i))
+        try:
+            batch.execute()
+        except Exception as e:
+            for i in range(offset, min(offset + BATCH_LIMIT, len(bodies))):
+                if results[i] is None:
+                    results[i] = e
+    return results
+
+
+def format_time(dt: datetime.datetime) -> str:
+    return dt.astimezone(TZ).strftime("%a %d %b, %I:%M %p")
+
+
+def format_range(start, end) -> str:
+    local_start, local_end = start.astimezone(TZ), end.astimezone(TZ)
+    if local_start.date() == local_end.date():
+        return f"{format_time(start)} - {local_end.strftime('%I:%M %p')}"
+    return f"{format_time(start)} - {format_time(end)}"
+
+
+# --- TOOL REPORTS ---
+# The text the calendar tools return. They take the service directly (tools/calendar.py passes
+# get_calendar_service()), so they can be tested without langchain. API errors propagate.
+
+def _conflict_lines(clashes):
+    return "\n".join(f"- {format_range(s, e)}: {label}" for s, e, label in clashes)
+
+
+def availability_report(service, start_time: str, end_time: str) -> str:
+    start, end = parse_time(start_time), parse_time(end_time)
+    clashes = load_events(service, start, end).conflicts(start, end)
+    if not clashes:
+        return f"✅ Free for all of {format_range(start, end)}."
+    return f"📅 Busy during {format_range(start, end)}:\n{_conflict_lines(clashes)}"
+
+
+def free_slots_report(service, window_start: str, window_end: str, duration_minutes: int = 60,
+                      day_start: str = "09:00", day_end: str = "18:00",
+                      include_weekends: bool = False, max_results: int = 5) -> str:
+    start, end = parse_time(window_start), parse_time(window_end)
+    slots = load_busy(service, start, end).free_slots(
+        start, end,
+        datetime.timedelta(minutes=duration_minutes),
+        day_start=datetime.time.fromisoformat(day_start),
+        day_end=datetime.time.fromisoformat(day_end),
+        include_weekends=include_weekends,
+        limit=max_results,
+    )
+    if not slots:
+        return f"No free {duration_minutes}-minute slots found between {format_range(start, end)}."
+    lines = "\n".join(f"- {format_range(s, e)}" for s, e in slots)
+    return f"🟢 **Free slots ({duration_minutes} min+):**\n{lines}"
+
+
+def create_event(service, summary: str, start_time: str, end_time: str,
+                 description: str = "", allow_conflicts: bool = False) -> str:
+    start, end = parse_time(start_time), parse_time(end_time)
+    if not allow_conflicts:
+        clashes = load_events(service, start, end).conflicts(start, end)
+        if clashes:
+            return (
+                f"⚠️ Not created. '{summary}' overlaps with:\n{_conflict_lines(clashes)}\n"
+                "Ask the user if they still want it (then retry with allow_conflicts=True)."
+            )
+    event = service.events().insert(calendarId="primary", body=build_event_body(summary, start, end, description)).execute()
+    return f"✅ Event created: {event.get('htmlLink')}"
+
+
+def create_events(service, events, allow_conflicts: bool = False) -> str:
+    """Conflict-checks all new events with one fetch (and against each other), then batch-inserts."""
+    if not events:
+        return "No events given."
+    parsed = [
+        (e["summary"], parse_time(e["start_time"]), parse_time(e["end_time"]), e.get("description", ""))
+        for e in events
+    ]
+    index = load_events(service, min(p[1] for p in parsed), max(p[2] for p in parsed))
+    clashes = []
+    for summary, start, end, _ in parsed:
+        for s, e, label in index.conflicts(start, end):
+            clashes.append(f"- '{summary}' overlaps {label} ({format_range(s, e)})")
+        index = index.add(start, end, summary)
+    if clashes and not allow_conflicts:
+        return (
+            "⚠️ Nothing created. Conflicts found:\n" + "\n".join(clashes) +
+            "\nAsk the user if they still want them (then retry with allow_conflicts=True)."
+        )
+
+    bodies = [build_event_body(summary, start, end, desc) for summary, start, end, desc in parsed]
+    results = insert_events_batch(service, bodies)
+    lines = []
+    for (summary, start, end, _), result in zip(parsed, results):
+        if isinstance(result, dict):
+            lines.append(f"✅ {summary} ({format_range(start, end)})")
+        else:
+            lines.append(f"❌ {summary}: {result}")
+    return "\n".join(lines)
@@ -7,6 +7,16 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from langchain_core.tools import tool
 
+try:
+    from tools.availability import (
+        availability_report, free_slots_report, create_event, create_events,
+    )
+except ImportError:
+    # Fallback for flat structure
+    from availability import (
+        availability_report, free_slots_report, create_event, create_events,
+    )
+
 # Scopes
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
 
@@ -46,7 +56,8 @@ def get_calendar_service():
 def list_calendar_events():
     """
     Lists the next 10 upcoming events on the user's calendar.
-    Useful for checking schedule, availability, or conflicts.
+    Useful for "what's next on my schedule?". For "am I free...?" or clash checks use
+    'check_availability'; to find open time use 'find_free_slots'.
     """
     service = get_calendar_service()
     if not service:
@@ -81,28 +92,85 @@ def list_calendar_events():
         return f"❌ Calendar API Error: {str(e)}"
 
 @tool
-def add_calendar_event(summary: str, start_time: str, end_time: str, description: str = ""):
+def add_calendar_event(summary: str, start_time: str, end_time: str, description: str = "", allow_conflicts: bool = False):
     """
-    Adds a new event to the calendar.
+    Adds a new event to the calendar. Checks for overlapping events first.
     Args:
         summary: Title of the event (e.g., "Meeting with John")
         start_time: ISO format string (e.g., "2024-01-20T14:00:00")
         end_time: ISO format string (e.g., "2024-01-20T15:00:00")
         description: Optional details.
+        allow_conflicts: Set True only after the user confirms they want to double-book.
     """
     service = get_calendar_service()
     if not service:
         return "❌ Error: Calendar access lost."
 
-    event = {
-        "summary": summary,
-        "description": description,
-        "start": {"dateTime": start_time, "timeZone": "Asia/Singapore"},
-        "end": {"dateTime": end_time, "timeZone": "Asia/Singapore"},
-    }
-
     try:
-        event = service.events().insert(calendarId="primary", body=event).execute()
-        return f"✅ Event created: {event.get('htmlLink')}"
+        return create_event(service, summary, start_time, end_time, description, allow_conflicts)
     except Exception as e:
         return f"❌ Failed to create event: {str(e)}"
+
+@tool
+def add_calendar_events(events: list[dict], allow_conflicts: bool = False):
+    """
+    Adds SEVERAL events in one go (faster than calling add_calendar_event repeatedly).
+    Args:
+        events: List of {"summary", "start_time", "end_time", "description" (optional)}.
+                Times are ISO format strings (e.g., "2024-01-20T14:00:00").
+        allow_conflicts: Set True only after the user confirms they want to double-book.
+    """
+    service = get_calendar_service()
+    if not service:
+        return "❌ Error: Calendar access lost."
+
+    try:
+        return create_events(service, events, allow_conflicts)
+    except Exception as e:
+        return f"❌ Failed to create events: {str(e)}"
+
+@tool
+def check_availability(start_time: str, end_time: str):
+    """
+    Checks if the user is free in a time range and lists any clashing events.
+    Use this for questions like "am I free Thursday afternoon?" instead of listing events.
+    Args:
+        start_time: ISO format string (e.g., "2024-01-20T13:00:00")
+        end_time: ISO format string (e.g., "2024-01-20T18:00:00")
+    """
+    service = get_calendar_service()
+    if not service:
+        return "❌ Error: Calendar access lost. Please type 'login' to re-authenticate."
+
+    try:
+        return availability_report(service, start_time, end_time)
+    except Exception as e:
+        return f"❌ Calendar API Error: {str(e)}"
+
+@tool
+def find_free_slots(window_start: str, window_end: str, duration_minutes: int = 60,
+                    day_start: str = "09:00", day_end: str = "18:00",
+                    include_weekends: bool = False, max_results: int = 5):
+    """
+    Finds open slots of at least 'duration_minutes' within working hours.
+    Use this for "find a 1-hour slot next week" style questions.
+    Args:
+        window_start: ISO format string where the search begins (e.g., "2024-01-22T00:00:00")
+        window_end: ISO format string where the search ends (e.g., "2024-01-27T00:00:00")
+        duration_minutes: Minimum length of the slot.
+        day_start: Earliest local time of day to consider ("HH:MM").
+        day_end: Latest local time of day to consider ("HH:MM").
+        include_weekends: Also search Saturdays and Sundays.
+        max_results: How many slots to return.
+    """
+    service = get_calendar_service()
+    if not service:
+        return "❌ Error: Calendar access lost. Please type 'login' to re-authenticate."
+
+    try:
+        return free_slots_report(
+            service, window_start, window_end, duration_minutes,
+            day_start, day_end, include_weekends, max_results,
+        )
+    except Exception as e:
+        return f"❌ Calendar API Error: {str(e)}"
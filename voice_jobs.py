@@ -0,0 +1,95 @@
+import os
+
+from jobs import JOB_DIR, PermanentJobError
+
+# --- VOICE NOTE PIPELINE (runs inside the JobQueue workers, see jobs.py) ---
+# download -> transcribe -> analyze -> deliver, resuming from the last checkpoint.
+# The slow/external steps are passed in via VoiceJobSteps so main.py wires the real
+# Whisper/LLM/Telegram calls and tests can use fakes.
+
+
+class VoiceJobSteps:
+    """
+    Async callables used by process_voice_job:
+      transcribe(audio_path) -> str
+      analyze(transcript) -> str (minutes)
+      is_subscribed(user_id) -> bool
+      deliver(chat_id, text)
+      remember(chat_id, text) (best effort: add the minutes to the chat thread)
+    """
+
+    def __init__(self, transcribe, analyze, is_subscribed, deliver, remember):
+        self.transcribe = transcribe
+        self.analyze = analyze
+        self.is_subscribed = is_subscribed
+        self.deliver = deliver
+        self.remember = remember
+
+
+async def update_job_status(bot, job, text):
+    """Progress goes into the job's status message. Never fail a job over a cosmetic edit."""
+    try:
+        await bot.edit_message_text(chat_id=job["chat_id"], message_id=job["payload"]["status_message_id"], text=text)
+    except Exception as e:
+        print(f"⚠️ Could not update status for job {job['id']}: {e}")
+
+
+async def process_voice_job(job, store, bot, steps: VoiceJobSteps):
+    """
+    Analysis uses analyze_meeting directly instead of the agent: no calendar tools run here,
+    so the shared token.json (owned by whichever handler ran last) is never used by a job.
+    """
+    chat_id = job["chat_id"]
+    stage = job["stage"]
+    payload = job["payload"]
+
+    # JOB_DIR may not survive a restart even if jobs.db does: download again
+    if stage == "downloaded" and not os.path.exists(payload.get("audio_path") or ""):
+        print(f"⚠️ Audio for job {job['id']} is gone, downloading again...")
+        stage = "queued"
+
+    if stage == "queued":
+        await update_job_status(bot, job, "⬇️ Downloading voice note...")
+        audio_path = os.path.join(JOB_DIR, f"job_{job['id']}.ogg")
+        file_ref = await bot.get_file(payload["file_id"])
+        await file_ref.download_to_drive(audio_path)
+        store.checkpoint(job["id"], "downloaded", audio_path=audio_path)
+        payload["audio_path"], stage = audio_path, "downloaded"
+
+    if stage == "downloaded":
+        await update_job_status(bot, job, "🎤 Transcribing...")
+        transcript = await steps.transcribe(payload["audio_path"])
+        store.checkpoint(job["id"], "transcribed", transcript=transcript)
+        if os.path.exists(payload["audio_path"]): os.remove(payload["audio_path"])
+        payload["transcript"], stage = transcript, "transcribed"
+
+    if stage == "transcribed":
+        # The job may have waited a while; don't spend on analysis for a lapsed subscription.
+        # Check the sender, not the chat: in groups the chat id is the group's.
+        if not await steps.is_subscribed(payload.get("user_id", chat_id)):
+            raise PermanentJobError("Subscription is no longer active.")
+        await update_job_status(bot, job, "🧠 Analyzing meeting...")
+        minutes = await steps.analyze(payload["transcript"])
+        # analyze_meeting reports failures as text; raise so the job is retried from the transcript
+        if minutes.startswith("Error analyzing meeting"):
+            raise RuntimeError(minutes)
+        store.checkpoint(job["id"], "analyzed", result=minutes)
+        payload["result"], stage = minutes, "analyzed"
+
+    if stage == "analyzed":
+        await steps.deliver(chat_id, payload["result"])
+        await steps.remember(chat_id, payload["result"])
+        # Only now: until delivery succeeds, retries and failure notices still edit this message
+        try:
+            await bot.delete_message(chat_id=chat_id, message_id=payload["status_message_id"])
+        except Exception:
+            pass
+        # Delivered: drop the bulky text so finished rows stay small until pruned
+        store.checkpoint(job["id"], "delivered", transcript=None, result=None)
+
+
+async def notify_job_failed(bot, job):
+    # Failed for good: the downloaded audio will never be used again
+    audio_path = job["payload"].get("audio_path")
+    if audio_path and os.path.exists(audio_path): os.remove(audio_path)
+    await update_job_status(bot, job, f"❌ Sorry, I couldn't process that voice note.\nError: {job['error']}")